@@ -0,0 +1,63 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+analyze_sutra.py 的字符分类加速模块 (可选)。
+编译: python setup.py build_ext --inplace
+"""
+
+from libc.stdint cimport uint64_t
+from cpython.unicode cimport Py_UNICODE_ISSPACE, Py_UNICODE_ISALNUM
+
+# 基本汉字范围 [一-龥]
+cdef enum:
+    CJK_FIRST = 0x4E00
+    CJK_COUNT = 0x9FA5 - 0x4E00 + 1
+
+
+cdef uint64_t _ascii_mask(str chars, int base):
+    # 把 [base, base + 64) 范围内属于 chars 的字符打包成位图
+    cdef uint64_t mask = 0
+    for ch in chars:
+        if base <= ord(ch) < base + 64:
+            mask |= (<uint64_t>1) << (ord(ch) - base)
+    return mask
+
+
+# ASCII 范围内的字符类别位图 (0-63 与 64-127 各一个)
+# 空白与 \s 一致，标点为既不是 \w 也不是 \s 的字符；ASCII 中的空白都在 0-63 内
+_ASCII_WS = ''.join(chr(i) for i in range(128) if Py_UNICODE_ISSPACE(i))
+_ASCII_PUNCT = ''.join(chr(i) for i in range(128)
+                       if not (Py_UNICODE_ISSPACE(i) or Py_UNICODE_ISALNUM(i) or i == ord('_')))
+cdef uint64_t WS_MASK = _ascii_mask(_ASCII_WS, 0)
+cdef uint64_t PUNCT_LO = _ascii_mask(_ASCII_PUNCT, 0)
+cdef uint64_t PUNCT_HI = _ascii_mask(_ASCII_PUNCT, 64)
+
+
+cpdef tuple classify(str text):
+    """
+    统计文本中的中文字数、空白数和标点数，返回 (chinese, whitespace, punctuation)。
+    分类规则与 analyze_sutra.py 中的正则一致：
+    中文为 [\\u4e00-\\u9fa5]，空白为 \\s，标点为非中文、非 \\w、非 \\s 的字符。
+    """
+    cdef Py_UCS4 c
+    cdef unsigned int code
+    cdef Py_ssize_t chinese = 0
+    cdef Py_ssize_t whitespace = 0
+    cdef Py_ssize_t punctuation = 0
+
+    for c in text:
+        code = c
+        if code < 64:
+            # ASCII 查表，无分支
+            whitespace += (WS_MASK >> code) & 1
+            punctuation += (PUNCT_LO >> code) & 1
+        elif code < 128:
+            punctuation += (PUNCT_HI >> (code - 64)) & 1
+        elif code - CJK_FIRST < CJK_COUNT:
+            # 无符号减法把两次比较合并为一次
+            chinese += 1
+        elif Py_UNICODE_ISSPACE(c):
+            whitespace += 1
+        elif not Py_UNICODE_ISALNUM(c):
+            punctuation += 1
+
+    return chinese, whitespace, punctuation
@@ -0,0 +1,57 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+# cython: freethreading_compatible=True
+"""
+main.py 的写入循环加速模块 (可选)。
+编译: python setup.py build_ext --inplace
+"""
+
+from libc.string cimport memcpy
+
+
+cdef void _run_writer(char* dst, Py_ssize_t start, Py_ssize_t end,
+                      const char* src, Py_ssize_t src_len, volatile int* stop,
+                      volatile unsigned long long* out_count,
+                      volatile unsigned long long* out_bytes,
+                      Py_ssize_t flush_every) noexcept nogil:
+    cdef Py_ssize_t cursor = start
+    cdef Py_ssize_t whole, batch, remaining, overflow, i
+    cdef unsigned long long count = 0
+
+    while not stop[0]:
+        # 到达区域末尾前还能完整写入的次数
+        whole = (end - cursor) // src_len
+
+        if whole:
+            batch = whole if whole < flush_every else flush_every
+            for i in range(batch):
+                memcpy(dst + cursor, src, src_len)
+                cursor += src_len
+        else:
+            # 回滚逻辑 (Wrap around)
+            remaining = end - cursor
+            if remaining > 0:
+                memcpy(dst + cursor, src, remaining)
+
+            overflow = src_len - remaining
+            memcpy(dst + start, src + remaining, overflow)
+            cursor = start + overflow
+            batch = 1
+
+        count += batch
+        out_count[0] = count
+        out_bytes[0] = count * src_len
+
+
+def run_writer(size_t dst_addr, Py_ssize_t start, Py_ssize_t end,
+               size_t src_addr, Py_ssize_t src_len, size_t stop_addr,
+               size_t count_addr, size_t bytes_addr, Py_ssize_t flush_every):
+    """
+    与 main.WriterThread 的写入循环逻辑相同，但整个循环在释放 GIL 的 C 代码中执行。
+    所有指针参数均为内存地址 (ctypes.addressof 的结果)，stop_addr 指向的 int 非零时退出。
+    """
+    with nogil:
+        _run_writer(<char*>dst_addr, start, end, <const char*>src_addr, src_len,
+                    <volatile int*>stop_addr,
+                    <volatile unsigned long long*>count_addr,
+                    <volatile unsigned long long*>bytes_addr,
+                    flush_every)
@@ -1,12 +1,73 @@
 import os
 import re
 import csv
+import codecs
 import jieba
 from collections import Counter
 from tqdm import tqdm
 
-
-def analyze_buddhist_text(file_path, output_csv_path, encoding='gbk'):
+try:
+    # 可选的 Cython 加速模块，编译方法: python setup.py build_ext --inplace
+    from _analyze import classify
+except ImportError:
+    classify = None
+
+# 每次从文件读取的字节数 (1 MB)
+CHUNK_SIZE = 1 << 20
+
+# 停用词/符号过滤集合（分词后不统计这些标点为“词”）
+# 包含常见的中英文标点
+IGNORE_SYMBOLS = frozenset({
+    '，', '。', '、', '；', '：', '？', '！', '“', '”', '‘', '’',
+    '（', '）', '【', '】', '《', '》', '…', '—', '·',
+    ',', '.', ';', ':', '?', '!', '"', "'", '(', ')', '[', ']', '<', '>', '-',
+    '\n', '\r', '\t', ' '
+})
+
+
+def _iter_text_blocks(f, encoding, pbar):
+    """
+    以二进制方式分块读取文件，按最后一个换行符 (LF，块内没有时为 CR) 切分后整块解码。
+    块尾不完整的行留到下一块拼接，保证不会把一行 (或一个多字节字符) 切断。
+    """
+    # 解码函数只查找一次，避免每块都按名称查找编解码器
+    decode = codecs.getdecoder(encoding)
+
+    # 尚未遇到换行符的数据块先放在列表里，找到换行符时才拼接一次，
+    # 避免超长的行 (或整个文件没有换行符) 时反复拼接导致的平方级复制
+    pending = []
+    while chunk := f.read(CHUNK_SIZE):
+        # 进度条直接使用实际读取的字节数，无需再次编码
+        pbar.update(len(chunk))
+
+        idx = chunk.rfind(b'\n')
+        if idx == -1:
+            # 只用 \r 换行的文件按最后一个 \r 切分；
+            # 块末尾的 \r 可能与下一块开头的 \n 组成 \r\n，不在此处切分
+            idx = chunk.rfind(b'\r', 0, len(chunk) - 1)
+        if idx == -1:
+            pending.append(chunk)
+            continue
+        pending.append(chunk[:idx + 1])
+        yield _decode_block(b''.join(pending), decode)
+        pending = [chunk[idx + 1:]]
+
+    # 文件末尾没有换行符的最后一行
+    tail = b''.join(pending)
+    if tail:
+        yield _decode_block(tail, decode)
+
+
+def _decode_block(data, decode):
+    # 使用 errors='replace' 防止因个别乱码导致程序崩溃
+    text, _ = decode(data, 'replace')
+    # 与文本模式保持一致：统一换行符为 \n
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+def analyze_buddhist_text(file_path, output_csv_path, encoding='gbk', use_hmm=True):
     # --- 1. 初始化统计变量 ---
     stats = {
         'total_chars': 0,  # 总字符数
@@ -18,6 +79,8 @@ def analyze_buddhist_text(file_path, output_csv_path, encoding='gbk'):
 
     # 用于统计词频
     word_counter = Counter()
+    # 用于统计每个字符出现的次数，最后再按字符种类汇总
+    char_counter = Counter()
 
     # --- 2. 预编译正则，提高匹配效率 ---
     # 匹配中文字符范围 (基本汉字范围，涵盖繁简)
@@ -28,55 +91,52 @@ def analyze_buddhist_text(file_path, output_csv_path, encoding='gbk'):
     # 这种方式比列举所有标点更通用
     re_not_punct = re.compile(r'[\u4e00-\u9fa5\w\s]')
 
-    # 停用词/符号过滤集合（分词后不统计这些标点为“词”）
-    # 包含常见的中英文标点
-    ignore_symbols = {
-        '，', '。', '、', '；', '：', '？', '！', '“', '”', '‘', '’',
-        '（', '）', '【', '】', '《', '》', '…', '—', '·',
-        ',', '.', ';', ':', '?', '!', '"', "'", '(', ')', '[', ']', '<', '>', '-',
-        '\n', '\r', '\t', ' '
-    }
-
     print(f"正在处理文件: {file_path}")
     print("这可能需要几分钟，具体取决于CPU性能...")
 
     # 获取文件大小用于进度条
     file_size = os.path.getsize(file_path)
 
-    try:
-        # 使用 errors='replace' 防止因个别乱码导致程序崩溃
-        with open(file_path, 'r', encoding=encoding, errors='replace') as f, \
-                tqdm(total=file_size, unit='B', unit_scale=True, desc="分析进度") as pbar:
+    # jieba 的并行分词基于 multiprocessing 的 fork，Windows 上不可用
+    parallel = os.name == 'posix'
+    if parallel:
+        jieba.enable_parallel(os.cpu_count())
 
-            for line in f:
-                # 更新读取字节数到进度条
-                # 注意：这里估算的字节数在不同行尾符下可能有微小偏差，但不影响总体进度显示
-                pbar.update(len(line.encode(encoding, errors='replace')))
+    try:
+        with open(file_path, 'rb') as f, \
+                tqdm(total=file_size, unit='B', unit_scale=True, desc="分析进度",
+                     mininterval=0.5, miniters=CHUNK_SIZE) as pbar:
 
+            # 每次处理约 1 MB 的完整行，而不是逐行处理
+            for text in _iter_text_blocks(f, encoding, pbar):
                 # --- 基础统计 ---
-                stats['lines'] += 1
-                stats['total_chars'] += len(line)
-
-                # 使用正则统计各类字符数量
-                stats['chinese_chars'] += len(re_chinese.findall(line))
-                stats['whitespace'] += len(re_whitespace.findall(line))
-
-                # 标点数 = 总长 - (中文字 + 英文/数字 + 空白)
-                # 或者直接反向匹配：匹配非字、非空白
-                # 这里使用简单的反向过滤法统计标点
-                non_punct_count = len(re_not_punct.findall(line))
-                stats['punctuation'] += (len(line) - non_punct_count)
+                # 最后一行可能没有换行符，同样计为一行
+                stats['lines'] += text.count('\n') + (not text.endswith('\n'))
+                stats['total_chars'] += len(text)
+
+                if classify is not None:
+                    # 已编译加速模块时，直接在 C 循环中完成字符分类
+                    chinese, whitespace, punctuation = classify(text)
+                    stats['chinese_chars'] += chinese
+                    stats['whitespace'] += whitespace
+                    stats['punctuation'] += punctuation
+                else:
+                    # 逐字符计数由 Counter 在 C 层完成，不再生成 findall 的临时列表
+                    char_counter.update(text)
 
                 # --- 分词与词频统计 ---
                 # jieba 处理繁体中文效果通常也不错
-                words = jieba.cut(line)
-
-                # 过滤掉单字标点、空白符，只统计有意义的词
-                # 如果你也想统计单个汉字（如“佛”），保留 len(w) >= 1 即可
-                # 如果只想统计双字及以上词语，改用 len(w) > 1
-                filtered_words = [w for w in words if w not in ignore_symbols and w.strip() != '']
-
-                word_counter.update(filtered_words)
+                # 整块文本一次分词，摊薄每次调用的开销
+                # 传入 use_hmm=False 可关闭 HMM 新词发现以大幅提速，
+                # 但词典外的词 (如“色不异空”) 会被拆成单字，词频结果会变化
+                words = jieba.cut(text, HMM=use_hmm)
+
+                # 直接计数，标点和空白在全部统计完成后统一剔除，
+                # 避免每个词都做一次过滤并生成临时列表
+                # 注意: 不要在分词前把标点替换成空格。jieba 本来就在标点处断开，
+                # 替换后标点只是变成了空格词，分词量不变；而 '.'、'-' 属于 jieba
+                # 的英文/数字词 (如 "22.5")，替换掉会改变分词结果
+                word_counter.update(words)
 
     except FileNotFoundError:
         print(f"错误: 找不到文件 {file_path}")
@@ -84,6 +144,27 @@ def analyze_buddhist_text(file_path, output_csv_path, encoding='gbk'):
     except UnicodeDecodeError as e:
         print(f"编码错误: 请确认文件是否为 {encoding} 格式。详细信息: {e}")
         return
+    finally:
+        if parallel:
+            jieba.disable_parallel()
+
+    # 过滤掉单字标点、空白符，只统计有意义的词
+    # 如果你也想统计单个汉字（如“佛”），保留 len(w) >= 1 即可
+    # 如果只想统计双字及以上词语，改用 len(w) > 1
+    for w in [w for w in word_counter if w in IGNORE_SYMBOLS or w.strip() == '']:
+        del word_counter[w]
+
+    # 使用正则统计各类字符数量 (未编译加速模块时)
+    # 不同的字符只有几万种，每种字符只需判断一次
+    for ch, count in char_counter.items():
+        if re_chinese.match(ch):
+            stats['chinese_chars'] += count
+        if re_whitespace.match(ch):
+            stats['whitespace'] += count
+        # 标点数 = 总数 - (中文字 + 英文/数字 + 空白)
+        # 这里使用简单的反向过滤法统计标点
+        if not re_not_punct.match(ch):
+            stats['punctuation'] += count
 
     # --- 3. 输出直接统计结果 ---
     print("\n" + "=" * 30)
@@ -103,8 +184,7 @@ def analyze_buddhist_text(file_path, output_csv_path, encoding='gbk'):
     with open(output_csv_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
         writer = csv.writer(csvfile)
         writer.writerow(['排名', '词语', '出现次数'])
-        for rank, (word, count) in enumerate(top_1000, 1):
-            writer.writerow([rank, word, count])
+        writer.writerows((rank, word, count) for rank, (word, count) in enumerate(top_1000, 1))
 
     print("完成！")
 
@@ -3,11 +3,18 @@ import sys
 import time
 import mmap
 import json
+import array
+import ctypes
 import platform
 import subprocess
-import threading
 from concurrent.futures import ThreadPoolExecutor
 
+try:
+    # 可选的 Cython 加速模块，编译方法: python setup.py build_ext --inplace
+    from _writer import run_writer
+except ImportError:
+    run_writer = None
+
 # ================= 跨平台配置 =================
 IS_WINDOWS = platform.system() == "Windows"
 
@@ -19,6 +26,20 @@ else:
     DEFAULT_TARGET_DIR = "/mnt/fast_ram"
     DEFAULT_TARGET_FILE = "speed_test_pool.dat"
 
+# 统计计数器的槽位间隔: 64 字节缓存行 / 8 字节计数器
+# 每个线程的计数器独占一个缓存行，避免多线程写入时的伪共享
+COUNTER_STRIDE = 8
+
+# 写入线程每批连续写入约这么多数据 (最多 64 次)，
+# 每批结束后才检查停止信号并把局部统计同步到共享数组
+FLUSH_BYTES = 256 * 1024 * 1024
+FLUSH_MAX_ITERS = 64
+
+# 各线程的写入区按大页 (2 MB) 对齐，源数据长度补齐到页大小的整数倍，
+# 这样每次写入都从页边界开始，减少跨页写入与 TLB 缺失
+HUGE_PAGE_SIZE = 2 * 1024 * 1024
+PAGE_SIZE = mmap.PAGESIZE
+
 
 class RAMDiskManager:
     """处理不同系统的 RAM Disk 初始化"""
@@ -71,56 +92,155 @@ class RAMDiskManager:
             return False
 
 
+class MmapTarget:
+    """通过内存映射写入测试文件，每次写入为一次 memmove (即 libc memcpy)"""
+
+    def __init__(self, path, size, src_buf):
+        self.f = open(path, 'r+b')
+        self.mm = mmap.mmap(self.f.fileno(), 0)
+
+        # Linux 上建议内核为映射区使用透明大页
+        if hasattr(mmap, "MADV_HUGEPAGE"):
+            try:
+                self.mm.madvise(mmap.MADV_HUGEPAGE)
+            except OSError as e:
+                print(f"[!] 无法启用透明大页 (不影响测试): {e}")
+
+        # 取得映射区和源数据的裸地址，供 ctypes.memmove 使用
+        # 注意: 这两个 ctypes 对象必须在线程结束后才能释放
+        self.mm_buf = (ctypes.c_char * size).from_buffer(self.mm)
+        self.src_buf = src_buf
+        self.dst_addr = ctypes.addressof(self.mm_buf)
+        self.src_addr = ctypes.addressof(src_buf)
+
+    def write(self, offset, src_offset, length):
+        ctypes.memmove(self.dst_addr + offset, self.src_addr + src_offset, length)
+
+    def close(self):
+        # 先释放对映射区的引用，否则 mmap 无法关闭
+        del self.mm_buf
+        self.mm.close()
+        self.f.close()
+
+
+class PwriteTarget:
+    """通过 os.pwrite 直接写入文件描述符 (仅 POSIX)，没有映射区的缺页与脏页跟踪开销"""
+
+    def __init__(self, path, src_buf):
+        self.fd = os.open(path, os.O_RDWR)
+        self.src_view = memoryview(src_buf).cast('B')
+
+    def write(self, offset, src_offset, length):
+        # 单次 pwrite 可能只写入一部分 (Linux 单次最多 0x7ffff000 字节)，循环直到全部写完
+        # memoryview 切片不拷贝数据
+        src_view = self.src_view
+        src_end = src_offset + length
+        while src_offset < src_end:
+            n = os.pwrite(self.fd, src_view[src_offset:src_end], offset)
+            if n == 0:
+                raise OSError(f"pwrite 在偏移 {offset} 处未写入任何数据")
+            src_offset += n
+            offset += n
+
+    def close(self):
+        self.src_view.release()
+        os.close(self.fd)
+
+
 class WriterThread:
     """写入线程工作类"""
 
-    def __init__(self, thread_id, mm, start_offset, end_offset, source_data, stop_event):
+    def __init__(self, thread_id, target, start_offset, end_offset, src_len, stop_flag,
+                 write_counts, written_bytes):
         self.tid = thread_id
-        self.mm = mm
+        # 写入目标 (MmapTarget 或 PwriteTarget)，按偏移写入源数据
+        self.target = target
         self.start_offset = start_offset
         self.end_offset = end_offset
-        self.source_data = source_data
-        self.src_len = len(source_data)
-        self.stop_event = stop_event
+        self.src_len = src_len
+        # 停止信号 (ctypes.c_int)，非零时在完成当前一批写入后退出
+        self.stop_flag = stop_flag
+
+        # 共享的统计数组 (SoA)，本线程只写自己的槽位
+        self.write_counts = write_counts
+        self.written_bytes = written_bytes
+        self.slot = thread_id * COUNTER_STRIDE
+        self.flush_every = max(1, min(FLUSH_MAX_ITERS, FLUSH_BYTES // max(self.src_len, 1)))
 
-        self.write_count = 0
-        self.total_bytes = 0
+    @staticmethod
+    def uses_native_loop(target_cls):
+        # 只有 mmap 方式能使用 Cython 写入循环 (需要映射区的裸地址)
+        return run_writer is not None and issubclass(target_cls, MmapTarget)
 
     def run(self):
+        if self.uses_native_loop(type(self.target)):
+            # 已编译加速模块时，整个写入循环在释放 GIL 的 C 代码中执行
+            self._run_native()
+        else:
+            self._run_python()
+
+    def _run_native(self):
+        target = self.target
+        run_writer(target.dst_addr, self.start_offset, self.end_offset,
+                   target.src_addr, self.src_len, ctypes.addressof(self.stop_flag),
+                   self._slot_addr(self.write_counts), self._slot_addr(self.written_bytes),
+                   self.flush_every)
+
+    def _slot_addr(self, counters):
+        # 共享统计数组中本线程槽位的内存地址
+        return ctypes.addressof(ctypes.c_uint64.from_buffer(counters, self.slot * 8))
+
+    def _run_python(self):
         cursor = self.start_offset
         # 局部变量提速
-        mm = self.mm
-        src_data = self.source_data
+        write = self.target.write
         src_len = self.src_len
         start_off = self.start_offset
         end_off = self.end_offset
+        write_counts = self.write_counts
+        written_bytes = self.written_bytes
+        slot = self.slot
+        flush_every = self.flush_every
+
+        stop_flag = self.stop_flag
+
+        # 线程内的局部统计，批量同步到共享数组以减少跨线程的缓存一致性流量
+        local_count = 0
 
         try:
-            # 只有在未收到停止信号时才继续下一轮完整写入
-            while not self.stop_event.is_set():
-                end_pos = cursor + src_len
+            # 只有在未收到停止信号时才继续下一批完整写入
+            while not stop_flag.value:
+                # 到达区域末尾前还能完整写入的次数，这一段内无需判断回滚
+                whole = (end_off - cursor) // src_len
 
-                if end_pos <= end_off:
+                if whole:
                     # 直接写入
-                    mm[cursor:end_pos] = src_data
-                    cursor = end_pos
+                    batch = min(whole, flush_every)
+                    for _ in range(batch):
+                        write(cursor, 0, src_len)
+                        cursor += src_len
                 else:
                     # 回滚逻辑 (Wrap around)
                     remaining = end_off - cursor
                     if remaining > 0:
-                        mm[cursor:end_off] = src_data[:remaining]
+                        write(cursor, 0, remaining)
 
                     overflow = src_len - remaining
-                    new_cursor = start_off + overflow
-                    mm[start_off:new_cursor] = src_data[remaining:]
-                    cursor = new_cursor
+                    write(start_off, remaining, overflow)
+                    cursor = start_off + overflow
+                    batch = 1
 
-                # 完成一次完整写入后更新统计
-                self.write_count += 1
-                self.total_bytes += src_len
+                # 完成一批完整写入后更新统计
+                local_count += batch
+                write_counts[slot] = local_count
+                written_bytes[slot] = local_count * src_len
 
         except Exception as e:
             print(f"[Thread {self.tid}] Error: {e}")
+        finally:
+            # 退出前同步剩余的统计
+            write_counts[slot] = local_count
+            written_bytes[slot] = local_count * src_len
 
 
 def load_config():
@@ -161,6 +281,30 @@ def main():
     pool_size = cfg.get("pool_size_gb", 6)
     interval = cfg.get("stats_interval_sec", 1)
 
+    # 写入方式: mmap 或 pwrite (仅 POSIX)
+    # AUTO 时，已编译加速模块则使用 mmap (可走 nogil 写入循环)，否则优先使用 pwrite
+    write_mode = str(cfg.get("write_mode") or "AUTO").lower()
+    if write_mode == "auto":
+        if run_writer is None and hasattr(os, "pwrite"):
+            write_mode = "pwrite"
+        else:
+            write_mode = "mmap"
+    elif write_mode not in ("mmap", "pwrite"):
+        print(f"[!] 错误: 未知的写入方式 'write_mode': {cfg.get('write_mode')}")
+        print("请将 config.json 中的 'write_mode' 改为 AUTO、mmap 或 pwrite。")
+        return
+    elif write_mode == "pwrite" and not hasattr(os, "pwrite"):
+        print("[!] 错误: 当前系统不支持 os.pwrite，无法使用 'pwrite' 写入方式")
+        print("请将 config.json 中的 'write_mode' 改为 AUTO 或 mmap。")
+        return
+
+    # 写入循环的选择与 WriterThread.run 共用同一判断
+    target_cls = PwriteTarget if write_mode == "pwrite" else MmapTarget
+    if WriterThread.uses_native_loop(target_cls):
+        writer_loop = "Cython (nogil)"
+    else:
+        writer_loop = "Python"
+
     # 组合路径
     target_full_path = os.path.join(target_dir, filename)
 
@@ -175,6 +319,8 @@ def main():
     print(f"目标地     : {target_full_path}")
     print(f"线程数     : {threads}")
     print(f"池大小     : {pool_size} GB")
+    print(f"写入方式   : {write_mode}")
+    print(f"写入循环   : {writer_loop}")
     print("============================================")
 
     # 2. 环境准备
@@ -188,33 +334,65 @@ def main():
         return
 
     print("[-] 正在加载源文件到内存...")
+    src_len = os.path.getsize(source_file)
+
+    # 源数据末尾补零到页大小的整数倍
+    padded_len = -(-src_len // PAGE_SIZE) * PAGE_SIZE
+    src_buf = (ctypes.c_char * padded_len)()
     with open(source_file, 'rb') as f:
-        source_data = f.read()
-    print(f"[-] 源文件大小: {len(source_data) / 1024 / 1024:.2f} MB")
+        # 直接读入预分配的缓冲区，不再生成中间的 bytes 对象再复制一次
+        with memoryview(src_buf).cast('B') as view:
+            src_len = f.readinto(view[:src_len])
+    print(f"[-] 源文件大小: {src_len / 1024 / 1024:.2f} MB")
 
-    # 4. 预分配文件
+    if src_len == 0:
+        print(f"[!] 错误: 源文件 '{source_file}' 为空")
+        print("请修改 config.json 中的 'source_file' 路径。")
+        return
+
+    # 每个线程的写入区按大页对齐，必须能容纳一份补齐后的源数据
     pool_bytes = pool_size * 1024 * 1024 * 1024
+    chunk_size = (pool_bytes // threads) & ~(HUGE_PAGE_SIZE - 1)
+    if chunk_size < padded_len:
+        print(f"[!] 错误: 每个线程的写入区 ({chunk_size / 1024 / 1024:.2f} MB) 小于源文件")
+        print("请增大 config.json 中的 'pool_size_gb' 或减少 'threads'。")
+        return
+
+    # 4. 预分配文件
     print(f"[-] 正在预分配 {pool_size} GB 空间...")
     try:
         with open(target_full_path, 'wb') as f:
-            f.truncate(pool_bytes)
+            if hasattr(os, "posix_fallocate"):
+                # 真正分配所有页面，避免测试过程中逐页补零
+                os.posix_fallocate(f.fileno(), 0, pool_bytes)
+            else:
+                f.truncate(pool_bytes)
     except OSError as e:
         print(f"[!] 创建测试文件失败: {e}")
         print("Windows用户请确认盘符正确且有写入权限。")
         return
 
-    # 5. 内存映射
+    if padded_len != src_len:
+        print(f"[-] 源数据按 {PAGE_SIZE} 字节对齐，补零 {padded_len - src_len} 字节")
+    src_len = padded_len
+
+    # 5. 打开写入目标
     try:
-        f_target = open(target_full_path, 'r+b')
-        mm = mmap.mmap(f_target.fileno(), 0)
+        if target_cls is PwriteTarget:
+            target = PwriteTarget(target_full_path, src_buf)
+        else:
+            target = MmapTarget(target_full_path, pool_bytes, src_buf)
     except Exception as e:
-        print(f"[!] 内存映射失败: {e}")
+        print(f"[!] 打开测试文件失败 ({write_mode}): {e}")
         return
 
     # 6. 启动线程
-    stop_event = threading.Event()
+    stop_flag = ctypes.c_int(0)
     workers = []
-    chunk_size = pool_bytes // threads
+
+    # 各线程的写入次数与字节数，按 tid * COUNTER_STRIDE 分槽存放
+    write_counts = memoryview(array.array('Q', bytes(8 * COUNTER_STRIDE * threads)))
+    written_bytes = memoryview(array.array('Q', bytes(8 * COUNTER_STRIDE * threads)))
 
     print(f"[-] 启动测试引擎 (统计间隔: {interval}s)...")
     executor = ThreadPoolExecutor(max_workers=threads)
@@ -222,7 +400,7 @@ def main():
     for i in range(threads):
         start = i * chunk_size
         end = start + chunk_size
-        w = WriterThread(i, mm, start, end, source_data, stop_event)
+        w = WriterThread(i, target, start, end, src_len, stop_flag, write_counts, written_bytes)
         workers.append(w)
         executor.submit(w.run)
 
@@ -242,8 +420,8 @@ def main():
             time.sleep(interval)
             now = time.perf_counter()
 
-            cur_bytes = sum(w.total_bytes for w in workers)
-            cur_count = sum(w.write_count for w in workers)
+            cur_bytes = sum(written_bytes[::COUNTER_STRIDE])
+            cur_count = sum(write_counts[::COUNTER_STRIDE])
 
             diff_bytes = cur_bytes - last_total_bytes
             diff_count = cur_count - last_total_count
@@ -266,7 +444,7 @@ def main():
         print("\n\n[*] 接收到停止信号 (Ctrl+C)...")
 
         # 通知线程在完成当前工作后停止
-        stop_event.set()
+        stop_flag.value = 1
 
         print("[*] 等待所有线程完成当前写入操作 (Graceful Shutdown)...")
         executor.shutdown(wait=True)
@@ -276,8 +454,8 @@ def main():
         total_time = end_time - start_test_time
         if total_time <= 0: total_time = 0.001
 
-        final_bytes = sum(w.total_bytes for w in workers)
-        final_count = sum(w.write_count for w in workers)
+        final_bytes = sum(written_bytes[::COUNTER_STRIDE])
+        final_count = sum(write_counts[::COUNTER_STRIDE])
         final_gb = final_bytes / 1024 ** 3
 
         avg_speed = final_gb / total_time
@@ -294,8 +472,7 @@ def main():
         print("=" * 50)
 
         # 资源清理
-        mm.close()
-        f_target.close()
+        target.close()
         print("[-] 资源已释放，程序退出。")
 
 
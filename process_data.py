@@ -1,8 +1,65 @@
 import os
 import csv
 import glob
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 
+# 读取源文件与写入合并文档时使用的缓冲区大小 (1 MB)
+READ_BUFFER_SIZE = 1 << 20
+WRITE_BUFFER_SIZE = 1 << 20
+
+# 经文信息标记与 Header 块分隔符
+# 只有两个固定字符串，str 的 in / startswith 已是 C 层的快速子串查找，
+# 实测比合并成一个正则 (或引入 Aho-Corasick 自动机) 逐行匹配更快
+META_TAG = '【經文資訊】'
+HEADER_DELIMITER = '#---'
+
+
+def process_one_file(path_tuple, encoding_type):
+    """
+    读取并清洗单个佛经文档，在子进程中执行。
+    返回 (相对路径, 經文資訊, 编码后的正文, 错误信息)，处理成功时错误信息为 None。
+    """
+    full_path, rel_path = path_tuple
+
+    try:
+        meta_info = "未找到資訊"
+        header_delimiter_count = 0  # 计数遇到的 #---
+        out_lines = []  # 需要写入合并文档的行
+
+        # 逐行流式读取单个源文件 (UTF-8)，不再用 readlines() 一次性生成整个行列表
+        with open(full_path, 'r', encoding='utf-8', buffering=READ_BUFFER_SIZE) as f_in:
+            for line in f_in:
+                stripped_line = line.strip()
+
+                # --- 任务 A: 提取【經文資訊】 ---
+                if META_TAG in line:
+                    temp_info = line.replace('#', '').replace(META_TAG, '').strip()
+                    if temp_info:
+                        meta_info = temp_info
+
+                # --- 任务 B: 识别并过滤 Header 块 ---
+                if line.startswith(HEADER_DELIMITER):
+                    header_delimiter_count += 1
+                    continue
+
+                if header_delimiter_count > 0 and header_delimiter_count < 2:
+                    continue
+
+                # --- 任务 C: 过滤空行 ---
+                if stripped_line:
+                    out_lines.append(stripped_line)
+
+        if out_lines:
+            out_lines.append('')
+        data = os.linesep.join(out_lines).encode(encoding_type, errors='ignore')
+        return rel_path, meta_info, data, None
+
+    except (OSError, UnicodeDecodeError) as e:
+        # 只处理读取与解码错误，程序本身的 bug 直接抛出，不被静默吞掉
+        return rel_path, None, None, str(e)
+
 
 def process_buddhist_scriptures(source_folder, output_txt_path, output_csv_path, encoding_type):
     """
@@ -55,57 +112,47 @@ def process_buddhist_scriptures(source_folder, output_txt_path, output_csv_path,
     print(f"共找到 {len(file_list)} 个文件，准备处理...")
 
     # 3. 打开输出文件准备写入
+    # 合并文档以二进制方式写入，每个源文件的正文整体编码后写入一次
+    # 换行符使用 os.linesep，与文本模式写入的结果保持一致
     try:
-        with open(output_txt_path, 'w', encoding=encoding_type, errors='ignore') as f_out, \
+        with open(output_txt_path, 'wb', buffering=WRITE_BUFFER_SIZE) as f_out, \
                 open(output_csv_path, 'w', encoding='utf-8-sig', newline='') as f_csv:
 
-            # 初始化 CSV 写入器
+            # 初始化 CSV 写入器，各文件的信息先收集起来，最后一次性写入
             csv_writer = csv.writer(f_csv)
             csv_writer.writerow(['文件相对路径', '經文資訊'])  # 写入表头
+            csv_rows = []
+            failed_files = []  # 读取失败的文件 (相对路径, 错误信息)
 
-            # 使用 tqdm 显示进度条
-            for full_path, rel_path in tqdm(file_list, desc="处理进度", unit="file"):
-
-                try:
-                    # 读取单个源文件 (UTF-8)
-                    with open(full_path, 'r', encoding='utf-8') as f_in:
-                        lines = f_in.readlines()
+            # 各文件的读取与清洗互不相关，分发到多个进程并行处理
+            # executor.map 按提交顺序返回结果，由主进程依次写入，保证合并顺序不变
+            worker = partial(process_one_file, encoding_type=encoding_type)
+            with ProcessPoolExecutor() as executor:
+                results = executor.map(worker, file_list, chunksize=64)
 
-                    meta_info = "未找到資訊"
-                    header_delimiter_count = 0  # 计数遇到的 #---
+                # 使用 tqdm 显示进度条
+                for rel_path, meta_info, data, error in tqdm(results, total=len(file_list),
+                                                             desc="处理进度", unit="file"):
+                    if error is not None:
+                        failed_files.append((rel_path, error))
+                        continue
 
-                    # 处理当前文件的每一行
-                    for line in lines:
-                        stripped_line = line.strip()
-
-                        # --- 任务 A: 提取【經文資訊】 ---
-                        if '【經文資訊】' in line:
-                            temp_info = line.replace('#', '').replace('【經文資訊】', '').strip()
-                            if temp_info:
-                                meta_info = temp_info
-
-                        # --- 任务 B: 识别并过滤 Header 块 ---
-                        if line.startswith('#---'):
-                            header_delimiter_count += 1
-                            continue
-
-                        if header_delimiter_count > 0 and header_delimiter_count < 2:
-                            continue
-
-                            # --- 任务 C: 过滤空行并写入 ---
-                        if stripped_line:
-                            f_out.write(stripped_line + '\n')
+                    f_out.write(data)
 
                     # 记录到 CSV
-                    csv_writer.writerow([rel_path, meta_info])
+                    csv_rows.append([rel_path, meta_info])
 
-                except Exception as e:
-                    print(f"\n处理文件出错: {rel_path}, 错误: {e}")
+            csv_writer.writerows(csv_rows)
 
     except IOError as e:
         print(f"无法打开或写入输出文件 (可能文件被占用或权限不足): {e}")
         return
 
+    if failed_files:
+        print(f"\n以下 {len(failed_files)} 个文件处理出错，已跳过:")
+        for rel_path, error in failed_files:
+            print(f"  {rel_path}, 错误: {error}")
+
     print("\n处理完成！")
     print(f"合并文档已保存至: {output_txt_path}")
     print(f"信息列表已保存至: {output_csv_path}")
@@ -0,0 +1,23 @@
+"""
+编译可选的 Cython 加速模块:
+    python setup.py build_ext --inplace
+未编译时各脚本会自动回落到纯 Python 实现。
+"""
+import sys
+from setuptools import setup, Extension
+from Cython.Build import cythonize
+
+if sys.platform == "win32":
+    EXTRA_COMPILE_ARGS = ["/O2"]
+else:
+    EXTRA_COMPILE_ARGS = ["-O3", "-march=native"]
+
+extensions = [
+    Extension("_analyze", ["_analyze.pyx"], extra_compile_args=EXTRA_COMPILE_ARGS),
+    Extension("_writer", ["_writer.pyx"], extra_compile_args=EXTRA_COMPILE_ARGS),
+]
+
+setup(
+    py_modules=[],
+    ext_modules=cythonize(extensions, language_level=3),
+)